@@ -5,17 +5,43 @@ Main FastAPI application with class management
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse, Response
+import orjson
+import asyncio
+import logging
+from logging.handlers import QueueHandler, QueueListener
 import os
+import queue
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager, contextmanager
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from io import BytesIO
 import aioftp
+
+# Install uvloop before any event loop exists so it also takes effect on
+# the Procfile's `uvicorn server:app` path, not just `python server.py`.
+try:
+    import uvloop
+    uvloop.install()
+except ImportError:
+    pass  # stdlib selector loop (e.g. Windows dev machines)
 # NO dotenv needed - Railway provides env vars directly
 
+# %-style logging args are only formatted when the level is enabled, so
+# debug lines cost a single int compare in production
+logger = logging.getLogger("inaya")
+
 # Create FastAPI app
 app = FastAPI(
     title="Inaya Backend API",
     description="School Management System Backend - Developed by Vertex",
     version="1.2.0",
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    default_response_class=ORJSONResponse  # C-level JSON encoding for every response
 )
 
 # Configure CORS - Allow all origins for mobile app
@@ -41,6 +67,30 @@ FTP_USER = os.getenv("FTP_USER", "")
 FTP_PASS = os.getenv("FTP_PASS", "")
 BASE_PATH = os.getenv("BASE_PATH", "/htdocs/classes")
 
+# Factories for the fixed-detail failure paths, so each error message lives
+# in one place. Always return a fresh instance: re-raising a cached
+# HTTPException grows its __traceback__ chain on every raise, pinning frames
+# (and their locals) for the life of the process.
+def _err_no_credentials() -> HTTPException:
+    return HTTPException(
+        status_code=500,
+        detail="FTP credentials not configured. Please set FTP_USER and FTP_PASS environment variables."
+    )
+
+
+def _err_empty_class_name() -> HTTPException:
+    return HTTPException(status_code=400, detail="Class name cannot be empty")
+
+
+def _err_class_not_found() -> HTTPException:
+    return HTTPException(status_code=404, detail="Class not found or permission denied")
+
+
+def _class_not_found(name: str) -> HTTPException:
+    """404 variants that embed the class name are built in one place"""
+    return HTTPException(status_code=404, detail=f"Class '{name}' not found")
+
+
 # Request Models
 class CreateClassRequest(BaseModel):
     class_name: str
@@ -49,59 +99,559 @@ class CreateClassRequest(BaseModel):
 class DeleteClassRequest(BaseModel):
     class_name: str
 
+class BatchStudentsRequest(BaseModel):
+    class_names: list
+
 # Helper Functions
+class PooledFTP(ftplib.FTP):
+    """FTP connection that sends TYPE I exactly once.
+
+    ftplib re-issues the TYPE command before every storbinary/retrbinary;
+    pooled connections never leave binary mode, so the repeat round trips
+    are pure waste.
+    """
+
+    _binary_mode = False
+
+    def voidcmd(self, cmd):
+        if cmd == 'TYPE I':
+            if self._binary_mode:
+                return '200'
+            resp = super().voidcmd(cmd)
+            self._binary_mode = True
+            return resp
+        if cmd.startswith('TYPE '):
+            self._binary_mode = False
+        return super().voidcmd(cmd)
+
+    def sendcmd(self, cmd):
+        # retrlines drops to ASCII via sendcmd('TYPE A'); track any TYPE
+        # change here too so the next TYPE I is actually re-sent instead
+        # of being skipped by the cache above
+        if cmd.startswith('TYPE ') and cmd != 'TYPE I':
+            self._binary_mode = False
+        return super().sendcmd(cmd)
+
+
+class PooledFTPTLS(PooledFTP, ftplib.FTP_TLS):
+    """TLS variant of PooledFTP; pooling amortizes the handshake cost"""
+
+
+# Opt-in FTPS: the handshake happens once per pooled connection, so the
+# TLS cost is paid at pool fill time rather than per request
+_FTP_USE_TLS = bool(os.getenv("FTP_USE_TLS"))
+
+
 def get_ftp_connection():
     """Create and return FTP connection with better error handling"""
     try:
-        print(f"[DEBUG] Attempting FTP connection to {FTP_HOST}")
-        ftp = ftplib.FTP(FTP_HOST, timeout=30)
-        print(f"[DEBUG] FTP object created, attempting login...")
-        ftp.login(FTP_USER, FTP_PASS)
-        print(f"[DEBUG] FTP login successful")
+        logger.debug("Attempting FTP connection to %s", FTP_HOST)
+        if _FTP_USE_TLS:
+            ftp = PooledFTPTLS(FTP_HOST, timeout=30)
+            logger.debug("FTP object created, attempting login...")
+            ftp.login(FTP_USER, FTP_PASS)
+            ftp.prot_p()  # encrypt the data channel as well
+        else:
+            ftp = PooledFTP(FTP_HOST, timeout=30)
+            logger.debug("FTP object created, attempting login...")
+            ftp.login(FTP_USER, FTP_PASS)
+        logger.debug("FTP login successful")
+        # Negotiate transfer settings once up front - every later data
+        # command reuses them instead of re-sending TYPE/PASV chatter
+        ftp.set_pasv(True)
+        ftp.voidcmd('TYPE I')
         return ftp
     except ftplib.error_perm as e:
         error_msg = f"FTP Login Failed - Invalid credentials: {str(e)}"
-        print(f"[ERROR] {error_msg}")
+        logger.error(error_msg)
         raise HTTPException(
             status_code=500,
             detail=f"{error_msg}. Check FTP_USER and FTP_PASS environment variables."
         )
     except Exception as e:
         error_msg = f"FTP Connection Failed: {str(e)}"
-        print(f"[ERROR] {error_msg}")
+        logger.error(error_msg)
         raise HTTPException(
             status_code=500,
             detail=f"{error_msg}. Check FTP_HOST environment variable and network connectivity."
         )
 
+class FTPConnectionPool:
+    """Small pool of persistent, pre-logged-in FTP connections.
+
+    Opening a fresh connection per request pays the full TCP handshake +
+    AUTH + PASV negotiation every time; keeping a few warm connections
+    amortizes that cost across requests.
+    """
+
+    def __init__(self, size: int = 4):
+        self.size = size
+        self._idle: queue.Queue = queue.Queue(maxsize=size)
+        self._created = 0
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        """Create a fresh logged-in connection (raises HTTPException on failure)"""
+        return get_ftp_connection()
+
+    def _checkout(self):
+        try:
+            ftp = self._idle.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                can_grow = self._created < self.size
+                if can_grow:
+                    self._created += 1
+            if can_grow:
+                try:
+                    return self._connect()
+                except Exception:
+                    with self._lock:
+                        self._created -= 1
+                    raise
+            ftp = self._idle.get(timeout=30)
+        # Cheap health check on the idle connection; reconnect if stale
+        try:
+            ftp.voidcmd('NOOP')
+        except Exception:
+            try:
+                ftp.close()
+            except Exception:
+                pass
+            ftp = self._connect()
+        return ftp
+
+    def _checkin(self, ftp):
+        try:
+            self._idle.put_nowait(ftp)
+        except queue.Full:
+            self._discard(ftp)
+
+    def _discard(self, ftp):
+        with self._lock:
+            self._created -= 1
+        try:
+            ftp.close()
+        except Exception:
+            pass
+
+    @contextmanager
+    def acquire(self):
+        """Check out a pooled connection; return it on success, discard on error.
+
+        Meant to be used from worker threads (asyncio.to_thread) - ftplib is
+        fully synchronous, so every FTP call must stay off the event loop.
+        """
+        ftp = self._checkout()
+        try:
+            yield ftp
+        except Exception:
+            # Connection state is unknown after an error - don't reuse it
+            self._discard(ftp)
+            raise
+        else:
+            self._checkin(ftp)
+
+    def keepalive(self):
+        """NOOP every idle connection so the server's idle timeout never fires"""
+        survivors = []
+        while True:
+            try:
+                ftp = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                ftp.voidcmd('NOOP')
+                survivors.append(ftp)
+            except Exception:
+                self._discard(ftp)
+        for ftp in survivors:
+            self._checkin(ftp)
+
+    def close_all(self):
+        while True:
+            try:
+                ftp = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._discard(ftp)
+
+
+ftp_pool = FTPConnectionPool(size=int(os.getenv("FTP_POOL_SIZE", "4")))
+
+
+async def _pool_keepalive_loop():
+    """Background task: keep idle pooled connections alive every ~30s"""
+    while True:
+        await asyncio.sleep(30)
+        try:
+            await asyncio.to_thread(ftp_pool.keepalive)
+        except Exception as e:
+            logger.error("Pool keepalive failed: %s", e)
+
+
+# Directory-listing cache: /classes and the exists check are often called
+# back-to-back, and each NLST is a full round trip over the data channel.
+# Writers (create/delete) mutate the cached set in place so readers never
+# have to force a refresh.
+_LISTING_CACHE_TTL = 5.0
+_listing_cache = None  # (monotonic timestamp, set of filenames)
+_listing_lock = asyncio.Lock()
+
+
+def _fetch_listing():
+    """Fetch the BASE_PATH listing, creating the directory if missing"""
+    with ftp_pool.acquire() as ftp:
+        try:
+            ftp.cwd(BASE_PATH)
+        except ftplib.error_perm:
+            logger.debug("Directory %s not found, creating it...", BASE_PATH)
+            try:
+                # Split path and create each part
+                current_path = ''
+                for part in _BASE_PATH_PARTS:
+                    current_path += f'/{part}'
+                    try:
+                        ftp.mkd(current_path)
+                        logger.debug("Created directory: %s", current_path)
+                    except:
+                        pass  # Directory might already exist
+                ftp.cwd(BASE_PATH)
+            except Exception as create_error:
+                raise HTTPException(
+                    status_code=500,
+                    detail=f"Cannot access or create directory {BASE_PATH}. Error: {str(create_error)}"
+                )
+        # Prefer MLSD: structured output (type/size/modify facts) and no
+        # ambiguity about directories leaking into the listing
+        try:
+            entries = []
+            ftp.retrlines(f'MLSD {BASE_PATH}', entries.append)
+            names = []
+            for line in entries:
+                facts, _, name = line.partition(' ')
+                if not name:
+                    continue
+                fact_map = dict(
+                    item.split('=', 1) for item in facts.rstrip(';').split(';') if '=' in item
+                )
+                if fact_map.get('type', 'file').lower() == 'file':
+                    names.append(name)
+            return names
+        except ftplib.error_perm:
+            pass  # Server doesn't support MLSD - fall back to NLST
+
+        try:
+            return ftp.nlst()
+        except ftplib.error_perm:
+            # Directory is empty
+            return []
+
+
+async def get_cached_listing(force: bool = False) -> set:
+    """Return the set of filenames under BASE_PATH, served from cache when fresh"""
+    global _listing_cache
+    async with _listing_lock:
+        if not force and _listing_cache is not None:
+            ts, names = _listing_cache
+            if time.monotonic() - ts < _LISTING_CACHE_TTL:
+                return names
+        names = set(await asyncio.to_thread(_fetch_listing))
+        _listing_cache = (time.monotonic(), names)
+        return names
+
+
+def _listing_cache_add(filename: str):
+    if _listing_cache is not None:
+        _listing_cache[1].add(filename)
+    _exists_cache_put(filename, True)
+
+
+def _listing_cache_discard(filename: str):
+    if _listing_cache is not None:
+        _listing_cache[1].discard(filename)
+    _exists_cache_put(filename, False)
+
+
+# Positive/negative exists cache: bounded LRU so a client probing random
+# names can't grow it without limit. Writers keep it authoritative, so the
+# hot path is a dict lookup with zero FTP I/O.
+_EXISTS_CACHE_TTL = 5.0
+_EXISTS_CACHE_MAX = 1024
+_exists_cache = OrderedDict()  # filename -> (monotonic timestamp, exists)
+
+
+def _exists_cache_get(filename: str):
+    hit = _exists_cache.get(filename)
+    if hit is not None and time.monotonic() - hit[0] < _EXISTS_CACHE_TTL:
+        _exists_cache.move_to_end(filename)
+        return hit[1]
+    return None
+
+
+def _exists_cache_put(filename: str, exists: bool):
+    _exists_cache[filename] = (time.monotonic(), exists)
+    _exists_cache.move_to_end(filename)
+    while len(_exists_cache) > _EXISTS_CACHE_MAX:
+        _exists_cache.popitem(last=False)
+
+
+class TTLValue:
+    """Single-slot TTL cache for a read endpoint's response.
+
+    Keeps the last good value around past its TTL so readers can fall back
+    to slightly stale data when the FTP server is unreachable.
+    """
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._value = None
+        self._ts = 0.0
+
+    def get(self):
+        """Return the cached value if still fresh, else None"""
+        if self._value is not None and time.monotonic() - self._ts < self.ttl:
+            return self._value
+        return None
+
+    def get_stale(self):
+        """Return the last good value regardless of age (None if never set)"""
+        return self._value
+
+    def set(self, value):
+        self._value = value
+        self._ts = time.monotonic()
+
+    def clear(self):
+        self._value = None
+
+
+# Read-endpoint cache: the class list changes rarely. Writers clear it
+# after a successful upload. (/fees reads through the fees-data cache.)
+_classes_view_cache = TTLValue(ttl=20.0)
+
+
+@lru_cache(maxsize=1024)
 def normalize_class_name(class_name: str) -> str:
     """Normalize class name to lowercase and remove .json extension"""
-    name = class_name.strip().lower()
-    if name.endswith('.json'):
-        name = name[:-5]
-    return name
+    return class_name.strip().lower().removesuffix('.json')
 
-def create_empty_class_file(section: Optional[str] = None) -> dict:
-    """Create empty class JSON structure"""
-    return {}
+# Hoisted path constants - these never change after import, so building
+# them per request is pure interpreter overhead
+_BASE_PATH_PARTS = [p for p in BASE_PATH.strip('/').split('/') if p]
+_FEES_PATH = f"{BASE_PATH}/fees.json"
 
+# ftplib defaults to 8 KiB blocks; a larger block matches the TCP receive
+# window better and cuts the number of recv/write iterations per file
+_RETR_BLOCKSIZE = 131072
 
-async def ftp_read(path):
-    async with aioftp.Client.context(FTP_HOST, user=FTP_USER, password=FTP_PASS) as client:
-        if await client.exists(path):
-            async with client.download_stream(path) as stream:
-                content = await stream.read()
-                return json.loads(content.decode())
+
+def file_exists_on_server(ftp, filename: str) -> bool:
+    """Probe one file with MLST - a single server-side stat, not a full listing"""
+    try:
+        ftp.voidcmd(f"MLST {filename}")
+        return True
+    except ftplib.error_perm as e:
+        if str(e)[:3] == '550':
+            return False
+    # MLST unsupported (500/502) - a SIZE probe works everywhere
+    try:
+        ftp.size(filename)
+        return True
+    except ftplib.error_perm:
+        return False
+
+
+def retrieve_file(ftp, filename: str) -> bytearray:
+    """Download a file into a pre-sized buffer to avoid BytesIO growth copies"""
+    try:
+        size = ftp.size(filename)
+    except ftplib.all_errors:
+        size = None
+
+    buf = bytearray(size or 0)
+    offset = 0
+
+    def sink(chunk):
+        nonlocal offset
+        end = offset + len(chunk)
+        if end > len(buf):
+            # Server-reported size was short (or unknown) - grow instead
+            del buf[offset:]
+            buf.extend(chunk)
+        else:
+            buf[offset:end] = chunk
+        offset = end
+
+    ftp.retrbinary(f"RETR {filename}", sink, blocksize=_RETR_BLOCKSIZE)
+    del buf[offset:]
+    return buf
+
+
+class AioFTPPool:
+    """Pool of persistent aioftp clients for the async FTP helpers.
+
+    Mirrors FTPConnectionPool, but holds native-async clients so coroutine
+    code never hops through a worker thread. aioftp.Client.context opened
+    (and tore down) a fresh TCP+AUTH session on every helper call.
+    """
+
+    def __init__(self, size: int = 4):
+        self.size = size
+        self._idle: asyncio.Queue = asyncio.Queue(maxsize=size)
+        self._created = 0
+        self._lock = asyncio.Lock()
+
+    async def _connect(self) -> aioftp.Client:
+        client = aioftp.Client()
+        await client.connect(FTP_HOST)
+        await client.login(FTP_USER, FTP_PASS)
+        return client
+
+    async def _revive(self, client: aioftp.Client) -> aioftp.Client:
+        """Verify an idle client is still alive; replace it if the server
+        dropped the control connection while it sat in the queue."""
+        try:
+            await client.command("NOOP", "2xx")
+            return client
+        except Exception:
+            async with self._lock:
+                self._created -= 1
+            try:
+                client.close()
+            except Exception:
+                pass
+            return await self._checkout()
+
+    async def _checkout(self) -> aioftp.Client:
+        try:
+            return await self._revive(self._idle.get_nowait())
+        except asyncio.QueueEmpty:
+            pass
+        async with self._lock:
+            can_grow = self._created < self.size
+            if can_grow:
+                self._created += 1
+        if can_grow:
+            try:
+                return await self._connect()
+            except Exception:
+                async with self._lock:
+                    self._created -= 1
+                raise
+        return await self._revive(await self._idle.get())
+
+    async def _discard(self, client):
+        async with self._lock:
+            self._created -= 1
+        try:
+            client.close()
+        except Exception:
+            pass
+
+    @asynccontextmanager
+    async def acquire(self):
+        """Check out a pooled client; return it on success, discard on error"""
+        client = await self._checkout()
+        try:
+            yield client
+        except Exception:
+            await self._discard(client)
+            raise
+        else:
+            try:
+                self._idle.put_nowait(client)
+            except asyncio.QueueFull:
+                await self._discard(client)
+
+    async def close_all(self):
+        while True:
+            try:
+                client = self._idle.get_nowait()
+            except asyncio.QueueEmpty:
+                break
+            await self._discard(client)
+
+
+aioftp_pool = AioFTPPool(size=int(os.getenv("FTP_POOL_SIZE", "4")))
+
+# Serializes fee writers: fees.json is a single shared file, so concurrent
+# read-modify-write cycles would silently drop each other's updates
+_fees_lock = asyncio.Lock()
+
+# Whole-file fees cache: get_class_total_fees runs on every invoice, so a
+# dict lookup here replaces a full RETR of fees.json. Writers refresh it
+# with the blob they just uploaded (write-through), readers refill on TTL
+# expiry. Guarded by a threading lock because the student endpoints read
+# it from worker threads.
+_FEES_DATA_TTL = 60.0
+_fees_data_cache = {"data": None, "expires": 0.0}
+_fees_data_lock = threading.Lock()
+
+
+def _fees_data_get():
+    with _fees_data_lock:
+        if time.monotonic() < _fees_data_cache["expires"]:
+            return _fees_data_cache["data"]
+    return None
+
+
+def _fees_data_get_stale():
+    """Last stored fees data even if expired (FTP-outage fallback)"""
+    with _fees_data_lock:
+        return _fees_data_cache["data"]
+
+
+def _fees_data_store(data):
+    with _fees_data_lock:
+        _fees_data_cache["data"] = data
+        _fees_data_cache["expires"] = time.monotonic() + _FEES_DATA_TTL
+
+
+async def _client_read_json(client, path):
+    """Read a JSON file on an already-acquired client ({} if missing)"""
+    if not await client.exists(path):
         return {}
 
+    # Mirror retrieve_file: download into a pre-sized buffer instead of
+    # letting stream.read() grow-and-copy its way through the payload.
+    try:
+        stat = await client.stat(path)
+        size = int(stat.get("size", 0))
+    except (aioftp.StatusCodeError, ValueError, TypeError):
+        size = 0
+
+    buf = bytearray(size)
+    offset = 0
+    async with client.download_stream(path) as stream:
+        async for chunk in stream.iter_by_block(_RETR_BLOCKSIZE):
+            end = offset + len(chunk)
+            if end > len(buf):
+                # Server-reported size was short (or unknown) - grow instead
+                del buf[offset:]
+                buf.extend(chunk)
+            else:
+                buf[offset:end] = chunk
+            offset = end
+    del buf[offset:]
+    return orjson.loads(buf) if buf else {}
+
+async def _client_write_json(client, path, data):
+    """Write a JSON file on an already-acquired client"""
+    binary_data = orjson.dumps(data, option=orjson.OPT_INDENT_2)
+    async with client.upload_stream(path) as stream:
+        await stream.write(binary_data)
+
+async def ftp_read(path):
+    async with aioftp_pool.acquire() as client:
+        return await _client_read_json(client, path)
+
 async def ftp_write(path, data):
-    async with aioftp.Client.context(FTP_HOST, user=FTP_USER, password=FTP_PASS) as client:
-        binary_data = json.dumps(data, indent=2).encode()
-        async with client.upload_stream(path) as stream:
-            await stream.write(binary_data)
+    async with aioftp_pool.acquire() as client:
+        await _client_write_json(client, path, data)
 
 async def ftp_ensure_dir(dir_path: str):
-    async with aioftp.Client.context(FTP_HOST, user=FTP_USER, password=FTP_PASS) as client:
+    async with aioftp_pool.acquire() as client:
         try:
             await client.make_directory(dir_path, parents=True)
         except aioftp.StatusCodeError:
@@ -110,352 +660,354 @@ async def ftp_ensure_dir(dir_path: str):
 
 # ========== API ENDPOINTS ==========
 
+# These bodies never change for the lifetime of the process (the FTP config
+# is read once at import), so encode them exactly once instead of
+# re-serializing on every load-balancer probe
+_ROOT_BODY = orjson.dumps({
+    "message": "Inaya Backend API",
+    "version": "1.2.0",
+    "status": "running",
+    "developer": "Vertex"
+})
+
+_HEALTH_BODY = orjson.dumps({
+    "status": "healthy",
+    "ftp_configured": bool(FTP_USER and FTP_PASS),
+    "ftp_host": FTP_HOST if FTP_HOST else "NOT_SET",
+    "ftp_user": FTP_USER if FTP_USER else "NOT_SET",
+    "ftp_pass_set": "YES" if FTP_PASS else "NO",
+    "base_path": BASE_PATH if BASE_PATH else "NOT_SET"
+})
+
 @app.get("/")
 async def root():
     """Root endpoint - API status"""
-    return {
-        "message": "Inaya Backend API",
-        "version": "1.2.0",
-        "status": "running",
-        "developer": "Vertex"
-    }
+    return Response(content=_ROOT_BODY, media_type="application/json")
 
 @app.get("/health")
 async def health_check():
     """Health check endpoint with configuration status"""
-    return {
-        "status": "healthy",
-        "ftp_configured": bool(FTP_USER and FTP_PASS),
-        "ftp_host": FTP_HOST if FTP_HOST else "NOT_SET",
-        "ftp_user": FTP_USER if FTP_USER else "NOT_SET",
-        "ftp_pass_set": "YES" if FTP_PASS else "NO",
-        "base_path": BASE_PATH if BASE_PATH else "NOT_SET"
+    return Response(content=_HEALTH_BODY, media_type="application/json")
+
+# The environment never changes after process start, so the debug body
+# is a frozen snapshot encoded once. The route 404s unless explicitly
+# enabled - it leaks config details and has no business being reachable
+# in production.
+_DEBUG_CONFIG_ENABLED = bool(os.getenv("ENABLE_DEBUG_CONFIG"))
+_DEBUG_CONFIG_BODY = orjson.dumps({
+    "ftp_host": FTP_HOST or "NOT_SET",
+    "ftp_user": FTP_USER or "NOT_SET",
+    "ftp_pass_length": len(FTP_PASS) if FTP_PASS else 0,
+    "ftp_pass_set": bool(FTP_PASS),
+    "base_path": BASE_PATH or "NOT_SET",
+    "all_env_vars": {
+        key: value for key, value in os.environ.items()
+        if key.startswith('FTP_') or key in ['BASE_PATH', 'PORT']
     }
+})
 
 @app.get("/debug/config")
 async def debug_config():
-    """Debug endpoint to check environment variables (DO NOT USE IN PRODUCTION)"""
-    return {
-        "ftp_host": FTP_HOST or "NOT_SET",
-        "ftp_user": FTP_USER or "NOT_SET",
-        "ftp_pass_length": len(FTP_PASS) if FTP_PASS else 0,
-        "ftp_pass_set": bool(FTP_PASS),
-        "base_path": BASE_PATH or "NOT_SET",
-        "all_env_vars": {
-            key: value for key, value in os.environ.items() 
-            if key.startswith('FTP_') or key in ['BASE_PATH', 'PORT']
-        }
-    }
+    """Debug endpoint to check environment variables (requires ENABLE_DEBUG_CONFIG)"""
+    if not _DEBUG_CONFIG_ENABLED:
+        raise HTTPException(status_code=404, detail="Not found")
+    return Response(content=_DEBUG_CONFIG_BODY, media_type="application/json")
 
 @app.get("/classes")
 async def get_all_classes():
     """Get list of all class files from FTP server"""
-    ftp = None
     try:
         # Log FTP configuration (without password)
-        print(f"[DEBUG] Connecting to FTP: {FTP_HOST}")
-        print(f"[DEBUG] FTP User: {FTP_USER}")
-        print(f"[DEBUG] Base Path: {BASE_PATH}")
-        
+        logger.debug("Connecting to FTP: %s (user %s, base path %s)", FTP_HOST, FTP_USER, BASE_PATH)
+
         # Check if FTP credentials are configured
         if not FTP_USER or not FTP_PASS:
-            raise HTTPException(
-                status_code=500,
-                detail="FTP credentials not configured. Please set FTP_USER and FTP_PASS environment variables."
-            )
-        
-        ftp = get_ftp_connection()
-        print(f"[DEBUG] FTP connected successfully")
-        
-        # Try to change to BASE_PATH directory
-        try:
-            ftp.cwd(BASE_PATH)
-            print(f"[DEBUG] Changed to directory: {BASE_PATH}")
-        except ftplib.error_perm as e:
-            print(f"[DEBUG] Directory {BASE_PATH} not found, creating it...")
-            # Try to create the directory
-            try:
-                # Split path and create each part
-                parts = BASE_PATH.strip('/').split('/')
-                current_path = ''
-                for part in parts:
-                    current_path += f'/{part}'
-                    try:
-                        ftp.mkd(current_path)
-                        print(f"[DEBUG] Created directory: {current_path}")
-                    except:
-                        pass  # Directory might already exist
-                ftp.cwd(BASE_PATH)
-            except Exception as create_error:
-                raise HTTPException(
-                    status_code=500,
-                    detail=f"Cannot access or create directory {BASE_PATH}. Error: {str(create_error)}"
-                )
-        
-        # List all files in the directory
-        files = []
+            raise _err_no_credentials()
+
+        cached = _classes_view_cache.get()
+        if cached is not None:
+            return cached
+
         try:
-            files = ftp.nlst()
-            print(f"[DEBUG] Found {len(files)} files in directory")
-        except ftplib.error_perm:
-            # Directory is empty
-            print(f"[DEBUG] Directory is empty")
-            files = []
-        
-        # Filter JSON files and remove extension
-        classes = []
-        for file in files:
-            if file.endswith('.json'):
-                class_name = file[:-5].lower()
-                classes.append(class_name)
-                print(f"[DEBUG] Found class: {class_name}")
-        
-        # Sort alphabetically
-        classes.sort()
-        
-        print(f"[DEBUG] Returning {len(classes)} classes")
-        
-        return {
+            files = await get_cached_listing()
+        except Exception:
+            # FTP unreachable - serve the last good copy if we have one
+            stale = _classes_view_cache.get_stale()
+            if stale is not None:
+                return {**stale, "stale": True}
+            raise
+        logger.debug("Found %d files in directory", len(files))
+
+        # Filter JSON files, strip the extension, sort alphabetically
+        classes = sorted(
+            # No .lower() needed: normalize_class_name lowercases every
+            # name before it is ever written. Underscore-prefixed files
+            # (the _index.json summary, the invoice counter) are service
+            # metadata, not classes; the unprefixed counter name is what
+            # older deployments wrote.
+            f.removesuffix('.json') for f in files
+            if f.endswith('.json') and not f.startswith('_')
+            and f != "invoice_counter.json"
+        )
+
+        logger.debug("Returning %d classes", len(classes))
+
+        response = {
             "status": "success",
             "classes": classes,
             "total": len(classes),
             "ftp_host": FTP_HOST,
             "base_path": BASE_PATH
         }
-        
+        _classes_view_cache.set(response)
+        return response
+
     except HTTPException:
         raise
     except ftplib.error_perm as e:
         error_msg = f"FTP Permission Error: {str(e)}"
-        print(f"[ERROR] {error_msg}")
+        logger.error(error_msg)
         raise HTTPException(
             status_code=500,
             detail=f"{error_msg}. Check FTP credentials and permissions."
         )
     except ftplib.all_errors as e:
         error_msg = f"FTP Error: {str(e)}"
-        print(f"[ERROR] {error_msg}")
+        logger.error(error_msg)
         raise HTTPException(
             status_code=500,
             detail=f"{error_msg}. Check FTP_HOST, FTP_USER, FTP_PASS in environment variables."
         )
     except Exception as e:
         error_msg = f"Unexpected error: {str(e)}"
-        print(f"[ERROR] {error_msg}")
+        logger.error(error_msg)
         import traceback
         traceback.print_exc()
         raise HTTPException(
             status_code=500,
             detail=error_msg
         )
-    finally:
-        if ftp:
-            try:
-                ftp.quit()
-                print(f"[DEBUG] FTP connection closed")
-            except:
-                pass
 
 @app.post("/classes/create")
 async def create_class(request: CreateClassRequest):
     """Create new class JSON file on FTP server"""
-    ftp = None
     try:
         # Normalize class name to lowercase
         normalized_name = normalize_class_name(request.class_name)
-        
+
         if not normalized_name:
-            raise HTTPException(status_code=400, detail="Class name cannot be empty")
-        
-        # Connect to FTP
-        ftp = get_ftp_connection()
-        
-        # Check if file already exists
-        try:
-            ftp.cwd(BASE_PATH)
-            existing_files = ftp.nlst()
-            if f"{normalized_name}.json" in existing_files:
-                raise HTTPException(
-                    status_code=409,
-                    detail=f"Class '{normalized_name}' already exists"
-                )
-        except ftplib.error_perm:
-            # Directory doesn't exist, create it
-            try:
-                ftp.mkd(BASE_PATH)
-                ftp.cwd(BASE_PATH)
-            except:
-                pass
-        
-        # Create empty class file content
-        class_data = create_empty_class_file(request.section)
-        json_content = json.dumps(class_data, indent=2)
-        
-        # Upload file to FTP
-        from io import BytesIO
-        file_buffer = BytesIO(json_content.encode('utf-8'))
-        ftp.storbinary(f"STOR {normalized_name}.json", file_buffer)
-        
+            raise _err_empty_class_name()
+
+        filename = normalized_name + ".json"
+
+        def _create_file():
+            with ftp_pool.acquire() as ftp:
+                # Check if file already exists - single-file probe, not a
+                # listing of the whole directory
+                try:
+                    ftp.cwd(BASE_PATH)
+                    if file_exists_on_server(ftp, filename):
+                        raise HTTPException(
+                            status_code=409,
+                            detail=f"Class '{normalized_name}' already exists"
+                        )
+                except ftplib.error_perm:
+                    # Directory doesn't exist, create it
+                    try:
+                        ftp.mkd(BASE_PATH)
+                        ftp.cwd(BASE_PATH)
+                    except:
+                        pass
+
+                # New classes start as an empty JSON object. Same format
+                # as persist_class: 2-space indent, because these files
+                # are read (and occasionally eyeballed) outside this
+                # service
+                json_content = orjson.dumps({}, option=orjson.OPT_INDENT_2)
+
+                # Upload file to FTP
+                ftp.storbinary(f"STOR {filename}", BytesIO(json_content))
+                _index_update(ftp, normalized_name, 0)
+
+        await asyncio.to_thread(_create_file)
+        _listing_cache_add(filename)
+        _classes_view_cache.clear()
+
         return {
             "status": "success",
             "message": f"Class '{normalized_name}' created successfully",
             "class_name": normalized_name,
-            "file_name": f"{normalized_name}.json",
-            "file_path": f"{BASE_PATH}/{normalized_name}.json"
+            "file_name": filename,
+            "file_path": f"{BASE_PATH}/{filename}"
         }
-        
+
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to create class: {str(e)}")
-    finally:
-        if ftp:
-            try:
-                ftp.quit()
-            except:
-                pass
 
 @app.delete("/classes/delete")
 async def delete_class(request: DeleteClassRequest):
     """Delete class JSON file from FTP server"""
-    ftp = None
     try:
         # Normalize class name
         normalized_name = normalize_class_name(request.class_name)
-        
-        # Connect to FTP
-        ftp = get_ftp_connection()
-        ftp.cwd(BASE_PATH)
-        
-        # Check if file exists
-        existing_files = ftp.nlst()
-        if f"{normalized_name}.json" not in existing_files:
-            raise HTTPException(
-                status_code=404,
-                detail=f"Class '{normalized_name}' not found"
-            )
-        
-        # Delete the file
-        ftp.delete(f"{normalized_name}.json")
-        
+        filename = normalized_name + ".json"
+
+        def _delete_file():
+            with ftp_pool.acquire() as ftp:
+                ftp.cwd(BASE_PATH)
+                # No preflight listing - a missing file makes DELE itself
+                # raise error_perm, which the handler maps to 404
+                ftp.delete(filename)
+                _index_discard(ftp, normalized_name)
+
+        await asyncio.to_thread(_delete_file)
+        _listing_cache_discard(filename)
+        _class_cache_discard(normalized_name)
+        _classes_view_cache.clear()
+
         return {
             "status": "success",
             "message": f"Class '{normalized_name}' deleted successfully",
             "class_name": normalized_name
         }
-        
+
     except HTTPException:
         raise
     except ftplib.error_perm:
-        raise HTTPException(status_code=404, detail="Class not found or permission denied")
+        raise _err_class_not_found()
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to delete class: {str(e)}")
-    finally:
-        if ftp:
-            try:
-                ftp.quit()
-            except:
-                pass
-
-@app.get("/students/{class_name}")
-async def get_students(class_name: str):
-    try:
-        file_path = f"{BASE_PATH}/{class_name}.json"
-        students_db = await ftp_read(file_path)
 
-        if not students_db:
-            return {
-                "status": "error",
-                "message": f"No students found for class {class_name}",
-                "students": {}
-            }
+@app.post("/students/batch")
+async def get_students_batch(request: BatchStudentsRequest):
+    """Get students for several classes in one call, fetched concurrently"""
+    async def _fetch_one(class_name: str):
+        normalized_name = normalize_class_name(class_name)
+        filename = normalized_name + ".json"
 
-        # ✅ SUPPORTED BY BOTH APPS
-        return {
-            "status": "success",          # App-B requirement
-            "class": class_name,
-            "total_students": len(students_db),
-            "students": students_db       # App-A & App-B requirement
-        }
+        def _download():
+            # Each task checks out its own pooled connection - FTP clients
+            # must never be shared across concurrent transfers
+            with ftp_pool.acquire() as ftp:
+                ftp.cwd(BASE_PATH)
+                return retrieve_file(ftp, filename)
 
-    except Exception as e:
-        print("FETCH STUDENTS ERROR:", str(e))
-        return {
-            "status": "error",
-            "message": str(e),
-            "students": {}
-        }
+        try:
+            raw = await asyncio.to_thread(_download)
+            return normalized_name, orjson.loads(memoryview(raw))
+        except ftplib.error_perm:
+            return normalized_name, None
+        except json.JSONDecodeError:
+            return normalized_name, None
 
+    try:
+        async with asyncio.TaskGroup() as tg:
+            tasks = [tg.create_task(_fetch_one(name)) for name in request.class_names]
+    except* Exception as eg:
+        raise HTTPException(status_code=500, detail=f"Failed to get students: {str(eg.exceptions[0])}")
+
+    classes = {}
+    not_found = []
+    for task in tasks:
+        name, data = task.result()
+        if data is None:
+            not_found.append(name)
+        else:
+            classes[name] = data
 
+    return {
+        "status": "success",
+        "classes": classes,
+        "not_found": not_found,
+        "total": len(classes)
+    }
 
 @app.get("/classes/{class_name}/exists")
 async def check_class_exists(class_name: str):
     """Check if a class file exists"""
-    ftp = None
     try:
         normalized_name = normalize_class_name(class_name)
-        
-        ftp = get_ftp_connection()
-        ftp.cwd(BASE_PATH)
-        
-        existing_files = ftp.nlst()
-        exists = f"{normalized_name}.json" in existing_files
-        
+        filename = normalized_name + ".json"
+
+        cached = _exists_cache_get(filename)
+        if cached is not None:
+            exists = cached
+        else:
+            exists = filename in await get_cached_listing()
+            _exists_cache_put(filename, exists)
+
         return {
             "status": "success",
             "class_name": normalized_name,
             "exists": exists
         }
-        
+
     except Exception as e:
         return {
             "status": "error",
             "exists": False,
             "message": str(e)
         }
-    finally:
-        if ftp:
-            try:
-                ftp.quit()
-            except:
-                pass
 
 # ========== STUDENT MANAGEMENT ROUTES ==========
 
 @app.get("/students/{class_name}")
 async def get_students(class_name: str):
     """Get students for a specific class from FTP"""
-    ftp = None
+    normalized_name = normalize_class_name(class_name)
+
+    def _download():
+        # load_class serves repeat hits from the class-file cache
+        with ftp_pool.acquire() as ftp:
+            ftp.cwd(BASE_PATH)
+            return load_class(ftp, normalized_name)
+
     try:
-        normalized_name = normalize_class_name(class_name)
-        
-        # Connect to FTP
-        ftp = get_ftp_connection()
-        ftp.cwd(BASE_PATH)
-        
-        # Download the JSON file
-        from io import BytesIO
-        file_buffer = BytesIO()
-        ftp.retrbinary(f"RETR {normalized_name}.json", file_buffer.write)
-        
-        # Parse JSON
-        file_buffer.seek(0)
-        data = json.loads(file_buffer.read().decode('utf-8'))
-        
-        return data
-        
+        students_db = await asyncio.to_thread(_download)
     except ftplib.error_perm:
-        raise HTTPException(status_code=404, detail=f"Class '{class_name}' not found")
-    except json.JSONDecodeError:
-        raise HTTPException(status_code=500, detail="Invalid JSON in class file")
+        students_db = {}
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to get students: {str(e)}")
-    finally:
-        if ftp:
-            try:
-                ftp.quit()
-            except:
-                pass
+        logger.error("Fetch students failed: %s", e)
+        return {
+            "status": "error",
+            "message": str(e),
+            "students": {}
+        }
+
+    if not students_db:
+        # Both mobile apps expect a 200 envelope for a missing class,
+        # not a 404
+        return {
+            "status": "error",
+            "message": f"No students found for class {class_name}",
+            "students": {}
+        }
+
+    # ✅ SUPPORTED BY BOTH APPS
+    return {
+        "status": "success",          # App-B requirement
+        "class": class_name,
+        "total_students": len(students_db),
+        "students": students_db       # App-A & App-B requirement
+    }
+
+
+@app.get("/classes/summary")
+async def get_classes_summary():
+    """Per-class metadata (student counts, last modification) in one call"""
+    def _read():
+        with ftp_pool.acquire() as ftp:
+            ftp.cwd(BASE_PATH)
+            with _class_index_lock:
+                return dict(_load_class_index(ftp))
+
+    try:
+        index = await asyncio.to_thread(_read)
+        return {"status": "success", "classes": index, "total": len(index)}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to get class summary: {str(e)}")
 
 
 # ========== FEE MANAGEMENT ROUTES ==========
@@ -472,181 +1024,137 @@ class DeleteFeeRequest(BaseModel):
 @app.get("/fees")
 async def get_all_fees():
     """Get all class fees from single fees.json file"""
-    ftp = None
-    try:
-        # Connect to FTP
-        ftp = get_ftp_connection()
-        ftp.cwd(BASE_PATH)
-        
-        # Download the fees.json file
-        from io import BytesIO
-        file_buffer = BytesIO()
+    # Single cache for this endpoint: the same fees-data cache the
+    # invoice path reads, so staleness is bounded by one TTL and writers
+    # have exactly one thing to refresh
+    fee_data = _fees_data_get()
+    if fee_data is None:
         try:
-            ftp.retrbinary("RETR fees.json", file_buffer.write)
-        except ftplib.error_perm:
-            # fees.json doesn't exist, return empty
+            # ftp_read returns {} when the file doesn't exist yet
+            fee_data = await ftp_read(_FEES_PATH)
+            _fees_data_store(fee_data)
+        except json.JSONDecodeError:
+            raise HTTPException(status_code=500, detail="Invalid JSON in fees file")
+        except Exception as e:
+            # FTP unreachable - serve the last good copy if we have one
+            stale = _fees_data_get_stale()
+            if stale is None:
+                raise HTTPException(status_code=500, detail=f"Failed to get fees: {str(e)}")
             return {
                 "status": "success",
-                "class_fees": {},
-                "total_classes": 0
+                "class_fees": stale.get("class_fees", {}),
+                "total_classes": len(stale.get("class_fees", {})),
+                "stale": True
             }
-        
-        # Parse JSON
-        file_buffer.seek(0)
-        fee_data = json.loads(file_buffer.read().decode('utf-8'))
-        
-        return {
-            "status": "success",
-            "class_fees": fee_data.get("class_fees", {}),
-            "total_classes": len(fee_data.get("class_fees", {}))
-        }
-        
-    except json.JSONDecodeError:
-        raise HTTPException(status_code=500, detail="Invalid JSON in fees file")
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to get fees: {str(e)}")
-    finally:
-        if ftp:
-            try:
-                ftp.quit()
-            except:
-                pass
+
+    class_fees = fee_data.get("class_fees", {})
+    return {
+        "status": "success",
+        "class_fees": class_fees,
+        "total_classes": len(class_fees)
+    }
 
 @app.post("/fees/set")
 async def set_fee_structure(request: SetFeeRequest):
     """Set or update fee structure for a class in single fees.json file"""
-    ftp = None
     try:
         # Normalize class name
         normalized_name = normalize_class_name(request.class_name)
-        
+
         # Calculate total fees
         total_fees = (
             request.tuition_fees +
             request.lab_fees +
             request.miscellaneous_fees
         )
-        
-        # Connect to FTP
-        ftp = get_ftp_connection()
-        
-        try:
-            ftp.cwd(BASE_PATH)
-        except ftplib.error_perm:
-            # Directory doesn't exist, create it
-            try:
-                ftp.mkd(BASE_PATH)
-                ftp.cwd(BASE_PATH)
-            except:
-                pass
-        
-        # Download existing fees.json or create new
-        from io import BytesIO
-        all_fees = {"class_fees": {}}
-        
-        try:
-            file_buffer = BytesIO()
-            ftp.retrbinary("RETR fees.json", file_buffer.write)
-            file_buffer.seek(0)
-            all_fees = json.loads(file_buffer.read().decode('utf-8'))
-        except ftplib.error_perm:
-            # fees.json doesn't exist yet
-            pass
-        except json.JSONDecodeError:
-            # Invalid JSON, start fresh
-            pass
-        
-        # Update the specific class fees
-        all_fees["class_fees"][normalized_name] = {
-            "class_name": normalized_name,
-            "tuition_fees": request.tuition_fees,
-            "lab_fees": request.lab_fees,
-            "miscellaneous_fees": request.miscellaneous_fees,
-            "total_fees": total_fees
-        }
-        
-        # Upload updated fees.json
-        json_content = json.dumps(all_fees, indent=2)
-        file_buffer = BytesIO(json_content.encode('utf-8'))
-        ftp.storbinary("STOR fees.json", file_buffer)
-        
+
+        # One pooled session for the whole download-mutate-upload cycle,
+        # serialized so concurrent updates can't overwrite each other
+        async with _fees_lock:
+            async with aioftp_pool.acquire() as client:
+                try:
+                    await client.make_directory(BASE_PATH, parents=True)
+                except aioftp.StatusCodeError:
+                    pass  # Directory already exists
+
+                # Download existing fees.json or start fresh
+                try:
+                    all_fees = await _client_read_json(client, _FEES_PATH)
+                except json.JSONDecodeError:
+                    # Invalid JSON, start fresh
+                    all_fees = {}
+                if not all_fees:
+                    all_fees = {"class_fees": {}}
+                all_fees.setdefault("class_fees", {})
+
+                # Update the specific class fees
+                all_fees["class_fees"][normalized_name] = {
+                    "class_name": normalized_name,
+                    "tuition_fees": request.tuition_fees,
+                    "lab_fees": request.lab_fees,
+                    "miscellaneous_fees": request.miscellaneous_fees,
+                    "total_fees": total_fees
+                }
+
+                # Upload updated fees.json
+                await _client_write_json(client, _FEES_PATH, all_fees)
+        _fees_data_store(all_fees)
+
         return {
             "status": "success",
             "message": f"Fee structure set for class '{normalized_name}'",
             "class_name": normalized_name,
             "total_fees": total_fees
         }
-        
+
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to set fee structure: {str(e)}")
-    finally:
-        if ftp:
-            try:
-                ftp.quit()
-            except:
-                pass
 
 @app.delete("/fees/delete")
 async def delete_fee_structure(request: DeleteFeeRequest):
     """Delete fee structure for a class from fees.json"""
-    ftp = None
     try:
         # Normalize class name
         normalized_name = normalize_class_name(request.class_name)
-        
-        # Connect to FTP
-        ftp = get_ftp_connection()
-        ftp.cwd(BASE_PATH)
-        
-        # Download existing fees.json
-        from io import BytesIO
-        file_buffer = BytesIO()
-        try:
-            ftp.retrbinary("RETR fees.json", file_buffer.write)
-        except ftplib.error_perm:
-            raise HTTPException(
-                status_code=404,
-                detail="Fees file not found"
-            )
-        
-        file_buffer.seek(0)
-        all_fees = json.loads(file_buffer.read().decode('utf-8'))
-        
-        # Check if class exists
-        if normalized_name not in all_fees.get("class_fees", {}):
-            raise HTTPException(
-                status_code=404,
-                detail=f"Fee structure not found for class '{normalized_name}'"
-            )
-        
-        # Remove the class
-        del all_fees["class_fees"][normalized_name]
-        
-        # Upload updated fees.json
-        json_content = json.dumps(all_fees, indent=2)
-        file_buffer = BytesIO(json_content.encode('utf-8'))
-        ftp.storbinary("STOR fees.json", file_buffer)
-        
+
+        async with _fees_lock:
+            async with aioftp_pool.acquire() as client:
+                # Download existing fees.json
+                all_fees = await _client_read_json(client, _FEES_PATH)
+                if not all_fees:
+                    raise HTTPException(
+                        status_code=404,
+                        detail="Fees file not found"
+                    )
+
+                # Check if class exists
+                if normalized_name not in all_fees.get("class_fees", {}):
+                    raise HTTPException(
+                        status_code=404,
+                        detail=f"Fee structure not found for class '{normalized_name}'"
+                    )
+
+                # Remove the class
+                del all_fees["class_fees"][normalized_name]
+
+                # Upload updated fees.json
+                await _client_write_json(client, _FEES_PATH, all_fees)
+        _fees_data_store(all_fees)
+
         return {
             "status": "success",
             "message": f"Fee structure deleted for class '{normalized_name}'",
             "class_name": normalized_name
         }
-        
+
     except HTTPException:
         raise
     except json.JSONDecodeError:
         raise HTTPException(status_code=500, detail="Invalid JSON in fees file")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to delete fee structure: {str(e)}")
-    finally:
-        if ftp:
-            try:
-                ftp.quit()
-            except:
-                pass
 
 # ========== ERROR HANDLERS ==========
 
@@ -671,22 +1179,77 @@ async def server_error_handler(request, exc):
 @app.on_event("startup")
 async def startup_event():
     """Run on application startup"""
-    print("=" * 50)
-    print("Inaya Backend API - Starting")
-    print(f"FTP Host: {FTP_HOST}")
-    print(f"Base Path: {BASE_PATH}")
-    print("=" * 50)
+    logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO"))
+    # Hand records to a queue so a slow stdout never blocks the event
+    # loop; a listener thread does the actual writing
+    root = logging.getLogger()
+    sinks = root.handlers[:]
+    for handler in sinks:
+        root.removeHandler(handler)
+    log_queue = queue.SimpleQueue()
+    root.addHandler(QueueHandler(log_queue))
+    app.state.log_listener = QueueListener(log_queue, *sinks)
+    app.state.log_listener.start()
+
+    logger.info("Inaya Backend API - Starting")
+    logger.info("FTP Host: %s", FTP_HOST)
+    logger.info("Base Path: %s", BASE_PATH)
+    global _main_loop
+    _main_loop = asyncio.get_running_loop()
+    # Keep idle pooled FTP connections alive in the background
+    app.state.pool_keepalive = asyncio.create_task(_pool_keepalive_loop())
+    app.state.invoice_flusher = asyncio.create_task(_invoice_flusher())
+    app.state.pdf_cleanup = asyncio.create_task(_pdf_cleanup_loop())
+    # Sweep temp files orphaned by failed uploads in a previous run
+    asyncio.get_running_loop().run_in_executor(None, cleanup_orphan_temp_pdfs)
+    # Seed the in-memory invoice counter off the request path
+    asyncio.get_running_loop().run_in_executor(None, _seed_invoice_counter)
+    if REPORTLAB_AVAILABLE:
+        global _pdf_executor
+        _pdf_executor = ProcessPoolExecutor(
+            max_workers=int(os.getenv("PDF_WORKERS", "1"))
+        )
 
 @app.on_event("shutdown")
 async def shutdown_event():
     """Run on application shutdown"""
-    print("Inaya Backend API - Shutting down")
+    app.state.pool_keepalive.cancel()
+    app.state.invoice_flusher.cancel()
+    app.state.pdf_cleanup.cancel()
+    # Flush anything still queued so no acknowledged invoice is lost
+    leftover = []
+    while True:
+        try:
+            leftover.append(_invoice_queue.get_nowait())
+        except asyncio.QueueEmpty:
+            break
+    if leftover:
+        await asyncio.to_thread(_flush_invoice_batch, leftover)
+    if _pdf_executor is not None:
+        _pdf_executor.shutdown(wait=False)
+    ftp_pool.close_all()
+    await aioftp_pool.close_all()
+    logger.info("Inaya Backend API - Shutting down")
+    app.state.log_listener.stop()
 
 # This is required for Railway deployment
 if __name__ == "__main__":
     import uvicorn
     port = int(os.getenv("PORT", 8000))
-    uvicorn.run(app, host="0.0.0.0", port=port)
+    # uvloop roughly doubles socket-heavy throughput; fall back to the
+    # stdlib loop where it isn't available (e.g. Windows dev machines)
+    try:
+        import uvloop  # noqa: F401
+        loop_impl = "uvloop"
+    except ImportError:
+        loop_impl = "asyncio"
+    # httptools parses HTTP in C; same guarded fallback as the loop
+    try:
+        import httptools  # noqa: F401
+        http_impl = "httptools"
+    except ImportError:
+        http_impl = "h11"
+    uvicorn.run(app, host="0.0.0.0", port=port, loop=loop_impl, http=http_impl)
 
 
 # ========== COMPLETE STUDENT FEE MANAGEMENT SYSTEM ==========
@@ -695,7 +1258,6 @@ if __name__ == "__main__":
 
 from datetime import datetime, timedelta
 import os
-import glob
 import tempfile
 
 # Import ReportLab for PDF generation
@@ -709,7 +1271,47 @@ try:
     REPORTLAB_AVAILABLE = True
 except ImportError:
     REPORTLAB_AVAILABLE = False
-    print("[WARNING] ReportLab not installed - PDF generation will not work")
+    logging.getLogger("inaya").warning("ReportLab not installed - PDF generation will not work")
+
+if REPORTLAB_AVAILABLE:
+    # Styles are immutable per invoice, so build them once at import
+    # instead of re-running getSampleStyleSheet/ParagraphStyle per PDF
+    _PDF_STYLES = getSampleStyleSheet()
+    _PDF_TITLE_STYLE = ParagraphStyle(
+        'CustomTitle',
+        parent=_PDF_STYLES['Heading1'],
+        fontSize=18,
+        textColor=colors.HexColor('#0A1F44'),
+        alignment=TA_CENTER,
+        spaceAfter=12,
+    )
+    _PDF_HEADER_STYLE = ParagraphStyle(
+        'Header',
+        parent=_PDF_STYLES['Normal'],
+        fontSize=10,
+        alignment=TA_CENTER,
+        spaceAfter=6,
+    )
+    _PDF_STUDENT_TABLE_STYLE = TableStyle([
+        ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, -1), 10),
+        ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
+    ])
+    _PDF_FEE_TABLE_STYLE = TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#0A1F44')),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+        ('ALIGN', (1, 0), (1, -1), 'RIGHT'),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, -1), 10),
+        ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
+        ('GRID', (0, 0), (-1, -1), 1, colors.black),
+    ])
+    _PDF_TOTALS_TABLE_STYLE = TableStyle([
+        ('ALIGN', (1, 0), (1, -1), 'RIGHT'),
+        ('FONTNAME', (0, -1), (-1, -1), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, -1), 10),
+        ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
+    ])
 
 # ========== HELPER FUNCTIONS ==========
 
@@ -724,237 +1326,472 @@ def normalize_student_data(class_data):
     students = {k: v for k, v in class_data.items() if isinstance(v, dict)}
     return {"students": students, "_direct_format": True}
 
+def recompute_fees_remaining(student):
+    """Derive feesremaining from its three source fields in one place"""
+    total = int(student.get("totalfees", 0))
+    paid = int(student.get("feespaid", 0))
+    conc = int(student.get("concession", 0))
+    student["feesremaining"] = total - conc - paid
+    return student["feesremaining"]
+
 def prepare_for_save(class_data):
     """Convert back to original format for saving"""
     if class_data.get("_direct_format") == True:
         return class_data.get("students", {})
     return class_data
 
+# Class documents are read on every student mutation; caching the raw
+# JSON bytes for a short TTL skips the RETR when the same class is
+# touched repeatedly (fee-collection day). Writers store the exact
+# bytes they upload, so warm entries are always current. Raw bytes
+# rather than parsed dicts are cached so a handler that fails mid-way
+# can't leave half-mutated state behind.
+_CLASS_CACHE_TTL = 30.0
+_CLASS_CACHE_MAX = 128
+_class_cache: OrderedDict = OrderedDict()  # name -> (timestamp, raw bytes)
+_class_cache_lock = threading.Lock()
+
+
+def _class_cache_get(name):
+    with _class_cache_lock:
+        entry = _class_cache.get(name)
+        if entry is None:
+            return None
+        ts, raw = entry
+        if time.monotonic() - ts >= _CLASS_CACHE_TTL:
+            del _class_cache[name]
+            return None
+        _class_cache.move_to_end(name)
+        return raw
+
+
+def _class_cache_put(name, raw):
+    with _class_cache_lock:
+        _class_cache[name] = (time.monotonic(), raw)
+        _class_cache.move_to_end(name)
+        while len(_class_cache) > _CLASS_CACHE_MAX:
+            _class_cache.popitem(last=False)
+
+
+def _class_cache_discard(name):
+    with _class_cache_lock:
+        _class_cache.pop(name, None)
+
+
+def load_class(ftp, normalized_class):
+    """Parsed class document, served from the TTL cache when warm"""
+    raw = _class_cache_get(normalized_class)
+    if raw is None:
+        raw = bytes(retrieve_file(ftp, f"{normalized_class}.json"))
+        _class_cache_put(normalized_class, raw)
+    return orjson.loads(raw)
+
+
+def persist_class(ftp, normalized_class, class_data):
+    """Upload a class document and refresh the cache with the stored bytes"""
+    save_data = prepare_for_save(class_data)
+    # Keep the 2-space indent: these files are read (and occasionally
+    # eyeballed) outside this service
+    json_content = orjson.dumps(save_data, option=orjson.OPT_INDENT_2)
+    ftp.storbinary(f"STOR {normalized_class}.json", BytesIO(json_content))
+    _class_cache_put(normalized_class, json_content)
+
+
+# Per-class mutation locks: two concurrent read-modify-write cycles on
+# the same class would each RETR, apply their own delta and STOR, with
+# the second upload silently dropping the first (lost update). Plain
+# threading locks because the mutating bodies run in worker threads.
+_class_locks: dict = {}
+_class_locks_guard = threading.Lock()
+
+
+def _class_lock(normalized_class):
+    with _class_locks_guard:
+        lock = _class_locks.get(normalized_class)
+        if lock is None:
+            lock = _class_locks.setdefault(normalized_class, threading.Lock())
+        return lock
+
+
+# Class index: one small _index.json on FTP summarising every class
+# (student count, last modification) so dashboard views get their
+# numbers from a single download instead of one RETR per class. Kept
+# write-through in memory; mutating endpoints refresh it best-effort.
+_INDEX_FILENAME = "_index.json"
+_class_index_lock = threading.Lock()
+_class_index_cache = {"data": None}
+
+
+def _load_class_index(ftp):
+    """Index dict, fetched once then served from memory (call under lock)"""
+    if _class_index_cache["data"] is None:
+        try:
+            _class_index_cache["data"] = orjson.loads(retrieve_file(ftp, _INDEX_FILENAME))
+        except:
+            _class_index_cache["data"] = {}
+    return _class_index_cache["data"]
+
+
+def _index_update(ftp, normalized_class, student_count):
+    """Refresh one class's entry in _index.json (best effort)"""
+    try:
+        with _class_index_lock:
+            index = _load_class_index(ftp)
+            index[normalized_class] = {
+                "student_count": student_count,
+                "last_modified": datetime.now().isoformat(timespec="seconds"),
+            }
+            ftp.storbinary(f"STOR {_INDEX_FILENAME}", BytesIO(orjson.dumps(index)))
+    except Exception as e:
+        logger.error("Class index update failed: %s", e)
+
+
+def _index_discard(ftp, normalized_class):
+    """Drop a deleted class from _index.json (best effort)"""
+    try:
+        with _class_index_lock:
+            index = _load_class_index(ftp)
+            if index.pop(normalized_class, None) is not None:
+                ftp.storbinary(f"STOR {_INDEX_FILENAME}", BytesIO(orjson.dumps(index)))
+    except Exception as e:
+        logger.error("Class index update failed: %s", e)
+
+
+class ClassDocument:
+    """Mutable view of one class file inside a class_document() block"""
+
+    def __init__(self, data):
+        self.data = data
+        self.dirty = False
+
+    @property
+    def students(self):
+        return self.data["students"]
+
+
+@contextmanager
+def class_document(normalized_class, create_missing=False):
+    """Read-modify-write primitive for a class file.
+
+    Loads and normalizes the document on a pooled connection, yields a
+    ClassDocument, and - if the block marked it dirty - persists it on
+    the same connection before the checkout ends. Blocks that bail out
+    without mutating leave the stored file untouched.
+    """
+    with _class_lock(normalized_class), ftp_pool.acquire() as ftp:
+        ftp.cwd(BASE_PATH)
+        try:
+            class_data = load_class(ftp, normalized_class)
+        except:
+            if not create_missing:
+                raise
+            class_data = {}
+        doc = ClassDocument(normalize_student_data(class_data))
+        yield doc
+        if doc.dirty:
+            persist_class(ftp, normalized_class, doc.data)
+            _index_update(ftp, normalized_class, len(doc.students))
+
 def get_class_total_fees(class_name):
     """Get total fees from fees.json"""
-    ftp = None
-    try:
-        normalized_name = normalize_class_name(class_name)
-        ftp = get_ftp_connection()
+    normalized_name = normalize_class_name(class_name)
+
+    fees_data = _fees_data_get()
+    if fees_data is not None:
+        return fees_data.get("class_fees", {}).get(normalized_name, {}).get("total_fees", 0)
+
+    with ftp_pool.acquire() as ftp:
         ftp.cwd(BASE_PATH)
         
-        from io import BytesIO
-        file_buffer = BytesIO()
         try:
-            ftp.retrbinary("RETR fees.json", file_buffer.write)
-            file_buffer.seek(0)
-            fees_data = json.loads(file_buffer.read().decode('utf-8'))
-            return fees_data.get("class_fees", {}).get(normalized_name, {}).get("total_fees", 0)
+            raw = retrieve_file(ftp, "fees.json")
         except:
             return 0
-    finally:
-        if ftp:
-            try:
-                ftp.quit()
-            except:
-                pass
-
-def get_next_invoice_number():
-    """Get next invoice number"""
-    ftp = None
     try:
-        ftp = get_ftp_connection()
-        ftp.cwd(BASE_PATH)
-        
-        from io import BytesIO
+        fees_data = orjson.loads(raw)
+    except:
+        return 0
+    _fees_data_store(fees_data)
+    return fees_data.get("class_fees", {}).get(normalized_name, {}).get("total_fees", 0)
+
+# Underscore-prefixed like _index.json so the listing filter skips it
+_INVOICE_COUNTER_FILENAME = "_invoice_counter.json"
+
+def _read_invoice_counter(ftp):
+    """Read the next invoice number from _invoice_counter.json"""
+    # Underscore prefix keeps the counter out of the /classes listing,
+    # like _index.json; older deployments used the unprefixed name
+    for counter_file in (_INVOICE_COUNTER_FILENAME, "invoice_counter.json"):
         file_buffer = BytesIO()
         try:
-            ftp.retrbinary("RETR invoice_records.json", file_buffer.write)
-            file_buffer.seek(0)
-            invoice_data = json.loads(file_buffer.read().decode('utf-8'))
-            return invoice_data.get("next_invoice_number", 1)
+            ftp.retrbinary(f"RETR {counter_file}", file_buffer.write)
+            return orjson.loads(file_buffer.getvalue()).get("next", 1)
         except:
-            return 1
-    finally:
-        if ftp:
-            try:
-                ftp.quit()
-            except:
-                pass
+            pass
+    # Legacy layout: the counter lived inside the monolithic records file
+    file_buffer = BytesIO()
+    try:
+        ftp.retrbinary("RETR invoice_records.json", file_buffer.write)
+        return orjson.loads(file_buffer.getvalue()).get("next_invoice_number", 1)
+    except:
+        return 1
+
+# In-memory invoice counter: seeded from FTP once at startup, after
+# which allocating a number is a lock and an increment instead of a
+# RETR. The flusher persists the high-water mark with every batch.
+_invoice_counter = {"next": None}
+_invoice_counter_lock = threading.Lock()
+_INVOICE_COUNTER_GAP = 100
+
+def _seed_invoice_counter():
+    """Load the persisted counter, leaving a gap for unflushed numbers"""
+    try:
+        with ftp_pool.acquire() as ftp:
+            ftp.cwd(BASE_PATH)
+            persisted = _read_invoice_counter(ftp)
+    except Exception as e:
+        logger.error("Invoice counter seed failed: %s", e)
+        return
+    with _invoice_counter_lock:
+        if _invoice_counter["next"] is None:
+            # The gap covers numbers that were issued but not yet
+            # flushed when a previous process stopped
+            _invoice_counter["next"] = (
+                persisted + _INVOICE_COUNTER_GAP if persisted > 1 else persisted
+            )
 
-def save_invoice_record(invoice):
-    """Save invoice record"""
-    ftp = None
+def get_next_invoice_number():
+    """Get next invoice number"""
+    with _invoice_counter_lock:
+        if _invoice_counter["next"] is not None:
+            allocated = _invoice_counter["next"]
+            _invoice_counter["next"] = allocated + 1
+            return allocated
+    # Seeding hasn't finished yet - fall back to reading the counter
+    with ftp_pool.acquire() as ftp:
+        ftp.cwd(BASE_PATH)
+        return _read_invoice_counter(ftp)
+
+# Invoices are acknowledged immediately and flushed to FTP by a single
+# background task, so a fee-collection burst costs one APPE per batch
+# instead of one upload per invoice
+_invoice_queue: asyncio.Queue = asyncio.Queue()
+_INVOICE_FLUSH_INTERVAL = 0.5
+_INVOICE_FLUSH_MAX_BACKOFF = 30.0
+_main_loop = None  # set at startup; lets worker threads reach the queue
+
+def _invoice_number_value(invoice):
+    """Numeric part of an 'INV-00042' style invoice number (None if odd)"""
     try:
-        ftp = get_ftp_connection()
+        return int(invoice["invoice_number"].split("-")[-1])
+    except (KeyError, ValueError):
+        return None
+
+def _flush_invoice_batch(batch):
+    """Append a batch of invoices in one APPE and update the counter"""
+    with ftp_pool.acquire() as ftp:
         ftp.cwd(BASE_PATH)
         
-        from io import BytesIO
-        invoice_data = {"invoices": [], "next_invoice_number": 1}
+        # One line per invoice appended with APPE: O(1) in bytes and RAM
+        # no matter how long the invoice history gets
+        lines = b"".join(orjson.dumps(invoice) + b"\n" for invoice in batch)
+        ftp.storbinary("APPE invoice_records.jsonl", BytesIO(lines))
         
+        # Keep the counter in step with the highest number we just issued
+        issued = max(
+            (n for n in map(_invoice_number_value, batch) if n is not None),
+            default=None,
+        )
+        if issued is None:
+            issued = _read_invoice_counter(ftp)
+        counter = orjson.dumps({"next": issued + 1})
+        ftp.storbinary(f"STOR {_INVOICE_COUNTER_FILENAME}", BytesIO(counter))
+
+_PDF_CLEANUP_INTERVAL = 3600.0
+
+async def _pdf_cleanup_loop():
+    """Prune old invoice PDFs hourly instead of on every fee collection"""
+    while True:
+        await asyncio.sleep(_PDF_CLEANUP_INTERVAL)
         try:
-            file_buffer = BytesIO()
-            ftp.retrbinary("RETR invoice_records.json", file_buffer.write)
-            file_buffer.seek(0)
-            invoice_data = json.loads(file_buffer.read().decode('utf-8'))
-        except:
-            pass
-        
-        invoice_data["invoices"].append(invoice)
-        invoice_data["next_invoice_number"] = invoice_data.get("next_invoice_number", 1) + 1
-        
-        json_content = json.dumps(invoice_data, indent=2)
-        file_buffer = BytesIO(json_content.encode('utf-8'))
-        ftp.storbinary("STOR invoice_records.json", file_buffer)
-        
-        print(f"[DEBUG] Invoice saved: {invoice['invoice_number']}")
-        return invoice_data["next_invoice_number"] - 1
-    finally:
-        if ftp:
+            await asyncio.to_thread(cleanup_old_pdfs)
+        except Exception:
+            logger.exception("PDF cleanup failed")
+
+async def _invoice_flusher():
+    """Drain queued invoices and flush each burst as a single batch"""
+    backoff = _INVOICE_FLUSH_INTERVAL
+    while True:
+        batch = [await _invoice_queue.get()]
+        # Short window so a burst coalesces into one append
+        await asyncio.sleep(_INVOICE_FLUSH_INTERVAL)
+        while True:
             try:
-                ftp.quit()
-            except:
-                pass
+                batch.append(_invoice_queue.get_nowait())
+            except asyncio.QueueEmpty:
+                break
+        try:
+            await asyncio.to_thread(_flush_invoice_batch, batch)
+            logger.debug("Flushed %d invoice(s)", len(batch))
+            backoff = _INVOICE_FLUSH_INTERVAL
+        except Exception:
+            # These invoices were already acknowledged to the client, so
+            # they must not be dropped: put them back and retry with
+            # backoff until the FTP server comes good
+            logger.exception(
+                "Invoice flush failed (%d records), retrying in %.0fs",
+                len(batch), backoff,
+            )
+            for invoice in batch:
+                _invoice_queue.put_nowait(invoice)
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, _INVOICE_FLUSH_MAX_BACKOFF)
+        finally:
+            for _ in batch:
+                _invoice_queue.task_done()
+
+# Ring buffer of the most recently issued invoices: a limited /invoices
+# read can be answered from memory without touching FTP
+_RECENT_INVOICES_MAX = 200
+_recent_invoices: deque = deque(maxlen=_RECENT_INVOICES_MAX)
+_recent_invoices_lock = threading.Lock()
+
+def save_invoice_record(invoice):
+    """Queue an invoice for the background flusher"""
+    with _recent_invoices_lock:
+        _recent_invoices.append(invoice)
+    if _main_loop is not None:
+        # Safe from both the event loop and worker threads
+        _main_loop.call_soon_threadsafe(_invoice_queue.put_nowait, invoice)
+    else:
+        # No loop yet (e.g. scripted use): flush synchronously
+        _flush_invoice_batch([invoice])
+    logger.debug("Invoice queued: %s", invoice['invoice_number'])
+    return _invoice_number_value(invoice)
+
+# ReportLab layout is pure CPU and holds the GIL; rendering in a small
+# worker-process pool keeps it off the serving process. Created at
+# startup; None means render inline (scripted use, or startup not run).
+_pdf_executor = None
+
+def _render_invoice_pdf(temp_pdf_path, invoice_number, student_data, amount_paid, note, date_str=None):
+    """Render the invoice PDF to temp_pdf_path (no FTP, safe to run in a subprocess)"""
+    doc = SimpleDocTemplate(
+        temp_pdf_path,
+        pagesize=(A4[0], A4[1]/2),
+        topMargin=0.5*inch,
+        bottomMargin=0.5*inch,
+        leftMargin=0.75*inch,
+        rightMargin=0.75*inch
+    )
+    
+    elements = []
+    
+    # School name
+    school_name = Paragraph("INAYA SCHOOL", _PDF_TITLE_STYLE)
+    elements.append(school_name)
+    elements.append(Spacer(1, 0.1*inch))
+    
+    # Invoice header
+    invoice_header = Paragraph(
+        f"<b>INVOICE NO:</b> INV-{invoice_number:05d} | <b>DATE:</b> {date_str or datetime.now().strftime('%d-%b-%Y')}",
+        _PDF_HEADER_STYLE
+    )
+    elements.append(invoice_header)
+    elements.append(Spacer(1, 0.2*inch))
+    
+    # Student details
+    student_details = [
+        ['Student Name:', str(student_data.get('name', 'N/A'))],
+        ['Class:', str(student_data.get('class', 'N/A')).upper()],
+        ['Father Name:', str(student_data.get('father', 'N/A'))],
+        ['Phone:', str(student_data.get('phone', 'N/A'))],
+    ]
+    
+    student_table = Table(student_details, colWidths=[1.5*inch, 3.5*inch])
+    student_table.setStyle(_PDF_STUDENT_TABLE_STYLE)
+    
+    elements.append(student_table)
+    elements.append(Spacer(1, 0.2*inch))
+    
+    # Fee items
+    fee_data = [
+        ['Description', 'Amount'],
+        ['School Fees', f"₹{amount_paid}"],
+    ]
+    
+    fee_table = Table(fee_data, colWidths=[3.5*inch, 1.5*inch])
+    fee_table.setStyle(_PDF_FEE_TABLE_STYLE)
+    
+    elements.append(fee_table)
+    elements.append(Spacer(1, 0.2*inch))
+    
+    # Totals
+    totals_data = [
+        ['Total Fees:', f"₹{student_data.get('totalfees', 0)}"],
+        ['Amount Paid:', f"₹{amount_paid}"],
+        ['Balance:', f"₹{student_data.get('feesremaining', 0)}"],
+    ]
+    
+    totals_table = Table(totals_data, colWidths=[3.5*inch, 1.5*inch])
+    totals_table.setStyle(_PDF_TOTALS_TABLE_STYLE)
+    
+    elements.append(totals_table)
+    elements.append(Spacer(1, 0.3*inch))
+    
+    # Note
+    if note and note.strip():
+        note_para = Paragraph(f"<b>Note:</b> {note}", _PDF_STYLES['Normal'])
+        elements.append(note_para)
+        elements.append(Spacer(1, 0.2*inch))
+    
+    # Signature
+    signature = Paragraph("_____________________<br/>Admin Signature", _PDF_STYLES['Normal'])
+    elements.append(signature)
+    
+    # Build PDF
+    doc.build(elements)
 
-def generate_and_upload_pdf(invoice_number, student_data, amount_paid, note, created_by):
+def generate_and_upload_pdf(invoice_number, student_data, amount_paid, note, created_by, date_str=None):
     """Generate PDF and upload to FTP"""
     
     if not REPORTLAB_AVAILABLE:
         raise Exception("PDF generation not available - ReportLab not installed")
     
-    ftp = None
     try:
         # Generate PDF in temp location
         with tempfile.NamedTemporaryFile(mode='wb', suffix='.pdf', delete=False) as tmp_file:
             temp_pdf_path = tmp_file.name
         
-        print(f"[DEBUG] Creating PDF: {temp_pdf_path}")
-        
-        doc = SimpleDocTemplate(
-            temp_pdf_path,
-            pagesize=(A4[0], A4[1]/2),
-            topMargin=0.5*inch,
-            bottomMargin=0.5*inch,
-            leftMargin=0.75*inch,
-            rightMargin=0.75*inch
-        )
-        
-        elements = []
-        styles = getSampleStyleSheet()
-        
-        title_style = ParagraphStyle(
-            'CustomTitle',
-            parent=styles['Heading1'],
-            fontSize=18,
-            textColor=colors.HexColor('#0A1F44'),
-            alignment=TA_CENTER,
-            spaceAfter=12,
-        )
-        
-        header_style = ParagraphStyle(
-            'Header',
-            parent=styles['Normal'],
-            fontSize=10,
-            alignment=TA_CENTER,
-            spaceAfter=6,
-        )
-        
-        # School name
-        school_name = Paragraph("INAYA SCHOOL", title_style)
-        elements.append(school_name)
-        elements.append(Spacer(1, 0.1*inch))
-        
-        # Invoice header
-        invoice_header = Paragraph(
-            f"<b>INVOICE NO:</b> INV-{invoice_number:05d} | <b>DATE:</b> {datetime.now().strftime('%d-%b-%Y')}",
-            header_style
-        )
-        elements.append(invoice_header)
-        elements.append(Spacer(1, 0.2*inch))
-        
-        # Student details
-        student_details = [
-            ['Student Name:', str(student_data.get('name', 'N/A'))],
-            ['Class:', str(student_data.get('class', 'N/A')).upper()],
-            ['Father Name:', str(student_data.get('father', 'N/A'))],
-            ['Phone:', str(student_data.get('phone', 'N/A'))],
-        ]
-        
-        student_table = Table(student_details, colWidths=[1.5*inch, 3.5*inch])
-        student_table.setStyle(TableStyle([
-            ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, -1), 10),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
-        ]))
-        
-        elements.append(student_table)
-        elements.append(Spacer(1, 0.2*inch))
-        
-        # Fee items
-        fee_data = [
-            ['Description', 'Amount'],
-            ['School Fees', f"₹{amount_paid}"],
-        ]
-        
-        fee_table = Table(fee_data, colWidths=[3.5*inch, 1.5*inch])
-        fee_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#0A1F44')),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (1, 0), (1, -1), 'RIGHT'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, -1), 10),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
-            ('GRID', (0, 0), (-1, -1), 1, colors.black),
-        ]))
-        
-        elements.append(fee_table)
-        elements.append(Spacer(1, 0.2*inch))
-        
-        # Totals
-        totals_data = [
-            ['Total Fees:', f"₹{student_data.get('totalfees', 0)}"],
-            ['Amount Paid:', f"₹{amount_paid}"],
-            ['Balance:', f"₹{student_data.get('feesremaining', 0)}"],
-        ]
-        
-        totals_table = Table(totals_data, colWidths=[3.5*inch, 1.5*inch])
-        totals_table.setStyle(TableStyle([
-            ('ALIGN', (1, 0), (1, -1), 'RIGHT'),
-            ('FONTNAME', (0, -1), (-1, -1), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, -1), 10),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
-        ]))
-        
-        elements.append(totals_table)
-        elements.append(Spacer(1, 0.3*inch))
-        
-        # Note
-        if note and note.strip():
-            note_para = Paragraph(f"<b>Note:</b> {note}", styles['Normal'])
-            elements.append(note_para)
-            elements.append(Spacer(1, 0.2*inch))
+        logger.debug("Creating PDF: %s", temp_pdf_path)
         
-        # Signature
-        signature = Paragraph("_____________________<br/>Admin Signature", styles['Normal'])
-        elements.append(signature)
-        
-        # Build PDF
-        doc.build(elements)
-        print(f"[DEBUG] PDF created locally")
+        if _pdf_executor is not None:
+            _pdf_executor.submit(
+                _render_invoice_pdf,
+                temp_pdf_path, invoice_number, student_data, amount_paid, note, date_str,
+            ).result()
+        else:
+            _render_invoice_pdf(temp_pdf_path, invoice_number, student_data, amount_paid, note, date_str)
+        logger.debug("PDF created locally")
         
         # Upload to FTP
-        ftp = get_ftp_connection()
-        ftp.cwd(BASE_PATH)
-        
-        # Create PDF directory if doesn't exist
-        try:
-            ftp.cwd("pdf")
-        except:
-            print(f"[DEBUG] Creating pdf directory")
-            ftp.mkd("pdf")
-            ftp.cwd("pdf")
-        
-        # Upload PDF
-        pdf_filename = f"INV-{invoice_number:05d}.pdf"
-        with open(temp_pdf_path, 'rb') as pdf_file:
-            ftp.storbinary(f"STOR {pdf_filename}", pdf_file)
+        with ftp_pool.acquire() as ftp:
+            ftp.cwd(BASE_PATH)
+            
+            # Create PDF directory if doesn't exist
+            try:
+                ftp.cwd("pdf")
+            except:
+                logger.debug("Creating pdf directory")
+                ftp.mkd("pdf")
+                ftp.cwd("pdf")
+            
+            # Upload PDF
+            pdf_filename = f"INV-{invoice_number:05d}.pdf"
+            with open(temp_pdf_path, 'rb') as pdf_file:
+                ftp.storbinary(f"STOR {pdf_filename}", pdf_file)
         
-        print(f"[DEBUG] ✅ PDF uploaded to FTP: pdf/{pdf_filename}")
+        logger.debug("PDF uploaded to FTP: pdf/%s", pdf_filename)
         
         # Delete local temp file
         try:
@@ -965,106 +1802,103 @@ def generate_and_upload_pdf(invoice_number, student_data, amount_paid, note, cre
         return pdf_filename
         
     except Exception as e:
-        print(f"[ERROR] PDF generation/upload: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("PDF generation/upload: %s", e)
         raise
-    finally:
-        if ftp:
-            try:
-                ftp.quit()
-            except:
-                pass
+
+def cleanup_orphan_temp_pdfs():
+    """Delete temp invoice PDFs left behind by failed uploads.
+
+    scandir DirEntry objects carry a cached stat, so this is one syscall
+    per entry instead of the glob + getmtime pair.
+    """
+    cutoff = (datetime.now() - timedelta(days=1)).timestamp()
+    deleted = 0
+    try:
+        with os.scandir(tempfile.gettempdir()) as it:
+            for entry in it:
+                if (entry.name.startswith('tmp') and entry.name.endswith('.pdf')
+                        and entry.is_file() and entry.stat().st_mtime < cutoff):
+                    try:
+                        os.unlink(entry.path)
+                        deleted += 1
+                    except OSError:
+                        pass
+    except OSError as e:
+        logger.error("Temp PDF cleanup failed: %s", e)
+    if deleted:
+        logger.info("Removed %d orphaned temp PDFs", deleted)
 
 def cleanup_old_pdfs():
     """Delete PDFs older than 1 day OR keep only last 5"""
-    ftp = None
     try:
-        ftp = get_ftp_connection()
-        ftp.cwd(BASE_PATH)
-        
-        try:
-            ftp.cwd("pdf")
-        except:
-            return
-        
-        files = []
-        try:
-            ftp.retrlines('MLSD', lambda x: files.append(x))
-        except:
-            filenames = []
-            ftp.retrlines('NLST', filenames.append)
-            files = [f"name={f}" for f in filenames if f.endswith('.pdf')]
-        
-        pdf_files = []
-        for file_info in files:
-            parts = dict(item.split('=', 1) for item in file_info.split('; ') if '=' in item)
-            if 'name' in parts and parts['name'].endswith('.pdf'):
-                modify_time = parts.get('modify', '')
-                pdf_files.append({'name': parts['name'], 'modify': modify_time})
-        
-        print(f"[DEBUG] Found {len(pdf_files)} PDFs on FTP")
-        
-        # Delete PDFs older than 1 day
-        cutoff_date = (datetime.now() - timedelta(days=1)).strftime('%Y%m%d')
-        deleted_old = 0
-        
-        for pdf in pdf_files[:]:
-            if pdf['modify'] and pdf['modify'] < cutoff_date:
-                try:
-                    ftp.delete(pdf['name'])
-                    pdf_files.remove(pdf)
-                    deleted_old += 1
-                except:
-                    pass
-        
-        # Keep only last 5 PDFs
-        if len(pdf_files) > 5:
-            pdf_files.sort(key=lambda x: x['modify'] or '')
-            to_delete = len(pdf_files) - 5
-            for i in range(to_delete):
-                try:
-                    ftp.delete(pdf_files[i]['name'])
-                except:
-                    pass
-        
-        if deleted_old > 0:
-            print(f"[CLEANUP] Deleted {deleted_old} old PDFs")
-        
-    except Exception as e:
-        print(f"[ERROR] Cleanup failed: {str(e)}")
-    finally:
-        if ftp:
+        with ftp_pool.acquire() as ftp:
+            ftp.cwd(BASE_PATH)
+            
             try:
-                ftp.quit()
+                ftp.cwd("pdf")
             except:
-                pass
+                return
+            
+            files = []
+            try:
+                ftp.retrlines('MLSD', lambda x: files.append(x))
+            except:
+                filenames = []
+                ftp.retrlines('NLST', filenames.append)
+                files = [f"name={f}" for f in filenames if f.endswith('.pdf')]
+            
+            pdf_files = []
+            for file_info in files:
+                parts = dict(item.split('=', 1) for item in file_info.split('; ') if '=' in item)
+                if 'name' in parts and parts['name'].endswith('.pdf'):
+                    modify_time = parts.get('modify', '')
+                    pdf_files.append({'name': parts['name'], 'modify': modify_time})
+            
+            logger.debug("Found %d PDFs on FTP", len(pdf_files))
+            
+            # Delete PDFs older than 1 day
+            cutoff_date = (datetime.now() - timedelta(days=1)).strftime('%Y%m%d')
+            deleted_old = 0
+            
+            for pdf in pdf_files[:]:
+                if pdf['modify'] and pdf['modify'] < cutoff_date:
+                    try:
+                        ftp.delete(pdf['name'])
+                        pdf_files.remove(pdf)
+                        deleted_old += 1
+                    except:
+                        pass
+            
+            # Keep only last 5 PDFs
+            if len(pdf_files) > 5:
+                pdf_files.sort(key=lambda x: x['modify'] or '')
+                to_delete = len(pdf_files) - 5
+                for i in range(to_delete):
+                    try:
+                        ftp.delete(pdf_files[i]['name'])
+                    except:
+                        pass
+            
+            if deleted_old > 0:
+                logger.info("Deleted %d old PDFs", deleted_old)
+            
+    except Exception as e:
+        logger.error("Cleanup failed: %s", e)
 
 def get_pdf_from_ftp(pdf_filename):
     """Download PDF from FTP and return as bytes"""
-    ftp = None
     try:
-        ftp = get_ftp_connection()
-        ftp.cwd(BASE_PATH)
-        ftp.cwd("pdf")
-        
-        from io import BytesIO
-        file_buffer = BytesIO()
-        ftp.retrbinary(f"RETR {pdf_filename}", file_buffer.write)
-        file_buffer.seek(0)
-        
-        print(f"[DEBUG] Downloaded PDF: {pdf_filename}")
-        return file_buffer.getvalue()
+        with ftp_pool.acquire() as ftp:
+            ftp.cwd(BASE_PATH)
+            ftp.cwd("pdf")
+            
+            raw = retrieve_file(ftp, pdf_filename)
+        logger.debug("Downloaded PDF: %s", pdf_filename)
+        return bytes(raw)
         
     except Exception as e:
-        print(f"[ERROR] Failed to get PDF: {str(e)}")
+        logger.error("Failed to get PDF: %s", e)
         raise
-    finally:
-        if ftp:
-            try:
-                ftp.quit()
-            except:
-                pass
 
 # ========== REQUEST MODELS ==========
 
@@ -1101,150 +1935,92 @@ class UpdateConcessionRequest(BaseModel):
 
 # ========== ENDPOINTS ==========
 
-@app.post("/students/add")
-async def add_student(request: AddStudentRequest):
-    """Add new student"""
-    ftp = None
+def _do_add_student(request: AddStudentRequest):
+    """Blocking body of add_student; runs in a worker thread"""
     try:
         normalized_class = normalize_class_name(request.class_name)
         total_fees = get_class_total_fees(normalized_class)
         
-        ftp = get_ftp_connection()
-        ftp.cwd(BASE_PATH)
-        
-        from io import BytesIO
-        file_buffer = BytesIO()
-        try:
-            ftp.retrbinary(f"RETR {normalized_class}.json", file_buffer.write)
-            file_buffer.seek(0)
-            class_data = json.loads(file_buffer.read().decode('utf-8'))
-        except:
-            class_data = {}
-        
-        normalized_data = normalize_student_data(class_data)
-        
-        if request.student_id in normalized_data["students"]:
-            return {"status": "error", "message": "Student already exists"}
-        
-        normalized_data["students"][request.student_id] = {
-            "father": request.father,
-            "aadhar": request.aadhar,
-            "address": request.address,
-            "phone": request.phone,
-            "email": request.email,
-            "dob": request.dob,
-            "sex": request.sex,
-            "totalfees": total_fees,
-            "feespaid": 0,
-            "feesremaining": total_fees,
-            "concession": 0,
-            "sats": "",
-            "class": normalized_class,
-            "section": request.section,
-            "rollno": request.rollno,
-            "test": {},
-            "performance": {}
-        }
-        
-        save_data = prepare_for_save(normalized_data)
-        json_content = json.dumps(save_data, indent=2)
-        file_buffer = BytesIO(json_content.encode('utf-8'))
-        ftp.storbinary(f"STOR {normalized_class}.json", file_buffer)
+        with class_document(normalized_class, create_missing=True) as doc:
+            if request.student_id in doc.students:
+                return {"status": "error", "message": "Student already exists"}
+        
+            doc.students[request.student_id] = {
+                "father": request.father,
+                "aadhar": request.aadhar,
+                "address": request.address,
+                "phone": request.phone,
+                "email": request.email,
+                "dob": request.dob,
+                "sex": request.sex,
+                "totalfees": total_fees,
+                "feespaid": 0,
+                "feesremaining": total_fees,
+                "concession": 0,
+                "sats": "",
+                "class": normalized_class,
+                "section": request.section,
+                "rollno": request.rollno,
+                "test": {},
+                "performance": {}
+            }
+            doc.dirty = True
         
         return {"status": "success", "message": "Student added successfully"}
         
     except Exception as e:
         return {"status": "error", "message": str(e)}
-    finally:
-        if ftp:
-            try:
-                ftp.quit()
-            except:
-                pass
 
-@app.post("/students/update")
-async def update_student(request: UpdateStudentRequest):
-    """Update student"""
-    ftp = None
+@app.post("/students/add")
+async def add_student(request: AddStudentRequest):
+    """Add new student"""
+    return await asyncio.to_thread(_do_add_student, request)
+
+def _do_update_student(request: UpdateStudentRequest):
+    """Blocking body of update_student; runs in a worker thread"""
     try:
         normalized_class = normalize_class_name(request.class_name)
         
-        ftp = get_ftp_connection()
-        ftp.cwd(BASE_PATH)
-        
-        from io import BytesIO
-        file_buffer = BytesIO()
-        ftp.retrbinary(f"RETR {normalized_class}.json", file_buffer.write)
-        file_buffer.seek(0)
-        class_data = json.loads(file_buffer.read().decode('utf-8'))
-        
-        normalized_data = normalize_student_data(class_data)
-        
-        if request.student_id not in normalized_data["students"]:
-            return {"status": "error", "message": "Student not found"}
+        with class_document(normalized_class) as doc:
+            if request.student_id not in doc.students:
+                return {"status": "error", "message": "Student not found"}
         
-        normalized_data["students"][request.student_id].update(request.updates)
-        
-        student = normalized_data["students"][request.student_id]
-        if any(k in request.updates for k in ["totalfees", "feespaid", "concession"]):
-            total = int(student.get("totalfees", 0))
-            paid = int(student.get("feespaid", 0))
-            conc = int(student.get("concession", 0))
-            student["feesremaining"] = total - conc - paid
-        
-        save_data = prepare_for_save(normalized_data)
-        json_content = json.dumps(save_data, indent=2)
-        file_buffer = BytesIO(json_content.encode('utf-8'))
-        ftp.storbinary(f"STOR {normalized_class}.json", file_buffer)
+            student = doc.students[request.student_id]
+            student.update(request.updates)
+            if any(k in request.updates for k in ["totalfees", "feespaid", "concession"]):
+                recompute_fees_remaining(student)
+            doc.dirty = True
         
         return {"status": "success", "message": "Student updated successfully"}
         
     except Exception as e:
         return {"status": "error", "message": str(e)}
-    finally:
-        if ftp:
-            try:
-                ftp.quit()
-            except:
-                pass
 
-@app.post("/students/collect-fee")
-async def collect_student_fee(request: CollectFeeRequest):
-    """Collect fee"""
-    ftp = None
+@app.post("/students/update")
+async def update_student(request: UpdateStudentRequest):
+    """Update student"""
+    return await asyncio.to_thread(_do_update_student, request)
+
+def _do_collect_student_fee(request: CollectFeeRequest):
+    """Blocking body of collect_student_fee; runs in a worker thread"""
     try:
-        print(f"[DEBUG] Collect fee: {request.student_id}, Amount: {request.amount}")
+        logger.debug("Collect fee: %s, Amount: %s", request.student_id, request.amount)
         
         normalized_class = normalize_class_name(request.class_name)
-        ftp = get_ftp_connection()
-        ftp.cwd(BASE_PATH)
-        
-        from io import BytesIO
-        file_buffer = BytesIO()
-        ftp.retrbinary(f"RETR {normalized_class}.json", file_buffer.write)
-        file_buffer.seek(0)
-        class_data = json.loads(file_buffer.read().decode('utf-8'))
+        with class_document(normalized_class) as doc:
+            if request.student_id not in doc.students:
+                return {"status": "error", "message": "Student not found"}
         
-        normalized_data = normalize_student_data(class_data)
+            student = doc.students[request.student_id]
         
-        if request.student_id not in normalized_data["students"]:
-            return {"status": "error", "message": "Student not found"}
+            current_paid = int(student.get("feespaid", 0))
+            student["feespaid"] = current_paid + request.amount
         
-        student = normalized_data["students"][request.student_id]
-        
-        current_paid = int(student.get("feespaid", 0))
-        student["feespaid"] = current_paid + request.amount
-        
-        total = int(student.get("totalfees", 0))
-        conc = int(student.get("concession", 0))
-        student["feesremaining"] = total - conc - student["feespaid"]
-        
-        save_data = prepare_for_save(normalized_data)
-        json_content = json.dumps(save_data, indent=2)
-        file_buffer = BytesIO(json_content.encode('utf-8'))
-        ftp.storbinary(f"STOR {normalized_class}.json", file_buffer)
+            total = int(student.get("totalfees", 0))
+            recompute_fees_remaining(student)
+            doc.dirty = True
         
-        print(f"[DEBUG] ✅ Fee saved")
+        logger.debug("Fee saved")
         
         if not request.generate_invoice:
             return {
@@ -1256,6 +2032,7 @@ async def collect_student_fee(request: CollectFeeRequest):
         
         # Generate invoice
         try:
+            now = datetime.now()
             invoice_number = get_next_invoice_number()
             
             student_data = {
@@ -1272,7 +2049,8 @@ async def collect_student_fee(request: CollectFeeRequest):
                 student_data,
                 request.amount,
                 request.note,
-                request.created_by
+                request.created_by,
+                date_str=now.strftime('%d-%b-%Y')
             )
             
             invoice = {
@@ -1280,7 +2058,7 @@ async def collect_student_fee(request: CollectFeeRequest):
                 "student_name": request.student_id,
                 "class": normalized_class,
                 "amount_paid": request.amount,
-                "date": datetime.now().strftime("%Y-%m-%d"),
+                "date": now.strftime("%Y-%m-%d"),
                 "created_by": request.created_by,
                 "note": request.note,
                 "pdf_filename": pdf_filename,
@@ -1288,9 +2066,8 @@ async def collect_student_fee(request: CollectFeeRequest):
             }
             
             save_invoice_record(invoice)
-            cleanup_old_pdfs()
             
-            print(f"[DEBUG] ✅ Invoice generated: INV-{invoice_number:05d}")
+            logger.debug("Invoice generated: INV-%05d", invoice_number)
             
             return {
                 "status": "success",
@@ -1302,7 +2079,7 @@ async def collect_student_fee(request: CollectFeeRequest):
             }
             
         except Exception as pdf_error:
-            print(f"[ERROR] Invoice generation: {str(pdf_error)}")
+            logger.error("Invoice generation: %s", pdf_error)
             return {
                 "status": "partial_success",
                 "message": f"Fee saved but invoice failed: {str(pdf_error)}",
@@ -1311,46 +2088,26 @@ async def collect_student_fee(request: CollectFeeRequest):
             }
         
     except Exception as e:
-        print(f"[ERROR] {str(e)}")
+        logger.error("Collect fee failed: %s", e)
         return {"status": "error", "message": str(e)}
-    finally:
-        if ftp:
-            try:
-                ftp.quit()
-            except:
-                pass
 
-@app.post("/students/update-concession")
-async def update_student_concession(request: UpdateConcessionRequest):
-    """Update concession"""
-    ftp = None
+@app.post("/students/collect-fee")
+async def collect_student_fee(request: CollectFeeRequest):
+    """Collect fee"""
+    return await asyncio.to_thread(_do_collect_student_fee, request)
+
+def _do_update_student_concession(request: UpdateConcessionRequest):
+    """Blocking body of update_student_concession; runs in a worker thread"""
     try:
         normalized_class = normalize_class_name(request.class_name)
-        ftp = get_ftp_connection()
-        ftp.cwd(BASE_PATH)
-        
-        from io import BytesIO
-        file_buffer = BytesIO()
-        ftp.retrbinary(f"RETR {normalized_class}.json", file_buffer.write)
-        file_buffer.seek(0)
-        class_data = json.loads(file_buffer.read().decode('utf-8'))
-        
-        normalized_data = normalize_student_data(class_data)
-        
-        if request.student_id not in normalized_data["students"]:
-            return {"status": "error", "message": "Student not found"}
-        
-        student = normalized_data["students"][request.student_id]
-        student["concession"] = request.concession
+        with class_document(normalized_class) as doc:
+            if request.student_id not in doc.students:
+                return {"status": "error", "message": "Student not found"}
         
-        total = int(student.get("totalfees", 0))
-        paid = int(student.get("feespaid", 0))
-        student["feesremaining"] = total - request.concession - paid
-        
-        save_data = prepare_for_save(normalized_data)
-        json_content = json.dumps(save_data, indent=2)
-        file_buffer = BytesIO(json_content.encode('utf-8'))
-        ftp.storbinary(f"STOR {normalized_class}.json", file_buffer)
+            student = doc.students[request.student_id]
+            student["concession"] = request.concession
+            recompute_fees_remaining(student)
+            doc.dirty = True
         
         return {
             "status": "success",
@@ -1361,51 +2118,75 @@ async def update_student_concession(request: UpdateConcessionRequest):
         
     except Exception as e:
         return {"status": "error", "message": str(e)}
-    finally:
-        if ftp:
-            try:
-                ftp.quit()
-            except:
-                pass
 
-@app.get("/invoices")
-async def get_invoice_records():
-    """Get all invoices"""
-    ftp = None
+@app.post("/students/update-concession")
+async def update_student_concession(request: UpdateConcessionRequest):
+    """Update concession"""
+    return await asyncio.to_thread(_do_update_student_concession, request)
+
+def _do_get_invoice_records(limit=None):
+    """Blocking body of get_invoice_records; runs in a worker thread"""
     try:
-        ftp = get_ftp_connection()
-        ftp.cwd(BASE_PATH)
-        
-        from io import BytesIO
-        file_buffer = BytesIO()
-        try:
-            ftp.retrbinary("RETR invoice_records.json", file_buffer.write)
-            file_buffer.seek(0)
-            invoice_data = json.loads(file_buffer.read().decode('utf-8'))
+        # A limited read of the newest records can come from the ring
+        # buffer as long as it holds enough of them
+        if limit is not None and limit > 0:
+            with _recent_invoices_lock:
+                if len(_recent_invoices) >= limit:
+                    recent = list(_recent_invoices)[-limit:]
+                    return ORJSONResponse({
+                        "status": "success",
+                        "invoices": recent,
+                        "total": len(recent)
+                    })
+        
+        with ftp_pool.acquire() as ftp:
+            ftp.cwd(BASE_PATH)
             
-            return {
-                "status": "success",
-                "invoices": invoice_data.get("invoices", []),
-                "total": len(invoice_data.get("invoices", []))
-            }
-        except:
-            return {"status": "success", "invoices": [], "total": 0}
-    except Exception as e:
-        return {"status": "error", "message": str(e), "invoices": [], "total": 0}
-    finally:
-        if ftp:
+            # Legacy monolithic file from before the NDJSON switch - its
+            # records all predate the append-only log, so they sort first
+            file_buffer = BytesIO()
+            try:
+                ftp.retrbinary("RETR invoice_records.json", file_buffer.write)
+                invoices = orjson.loads(file_buffer.getvalue()).get("invoices", [])
+            except:
+                invoices = []
+
             try:
-                ftp.quit()
+                raw = retrieve_file(ftp, "invoice_records.jsonl")
+                invoices.extend(
+                    orjson.loads(line)
+                    for line in raw.splitlines()
+                    if line
+                )
             except:
                 pass
+        
+        if limit is not None and limit > 0:
+            invoices = invoices[-limit:]
+        
+        # Return the response object directly: with thousands of invoices
+        # the jsonable_encoder walk over every dict costs more than the
+        # orjson encode itself
+        return ORJSONResponse({
+            "status": "success",
+            "invoices": invoices,
+            "total": len(invoices)
+        })
+    except Exception as e:
+        return {"status": "error", "message": str(e), "invoices": [], "total": 0}
+
+@app.get("/invoices")
+async def get_invoice_records(limit: Optional[int] = None):
+    """Get all invoices (optionally just the most recent `limit`)"""
+    return await asyncio.to_thread(_do_get_invoice_records, limit)
 
 @app.get("/invoices/view/{pdf_filename}")
 async def view_invoice_pdf(pdf_filename: str):
     """View PDF in browser (inline, not download)"""
     try:
-        print(f"[DEBUG] Viewing PDF: {pdf_filename}")
+        logger.debug("Viewing PDF: %s", pdf_filename)
         
-        pdf_bytes = get_pdf_from_ftp(pdf_filename)
+        pdf_bytes = await asyncio.to_thread(get_pdf_from_ftp, pdf_filename)
         
         from fastapi.responses import Response
         
@@ -1419,7 +2200,7 @@ async def view_invoice_pdf(pdf_filename: str):
         )
         
     except Exception as e:
-        print(f"[ERROR] PDF view: {str(e)}")
+        logger.error("PDF view: %s", e)
         return {
             "status": "error",
             "message": f"Failed to view PDF: {str(e)}"